@@ -0,0 +1,378 @@
+# Shared HTTP bits for sync_repos.py and sync_activities.py
+# One pooled keep-alive session per host, timeouts, and retries with backoff
+# so a random 502 doesn't kill a whole run
+
+import contextlib
+import contextvars
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
+
+from metrics import endpoint, metrics
+
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', '30'))  # seconds, per request
+API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', '5'))
+API_BACKOFF = float(os.getenv('API_BACKOFF', '1'))  # base delay, doubles each retry
+API_BACKOFF_MAX = float(os.getenv('API_BACKOFF_MAX', '60'))
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', '16'))  # keep-alive connections per host
+API_PER_PAGE = int(os.getenv('API_PER_PAGE', '100'))  # max both GitHub and GitLab allow
+# Start spreading requests out once less than this fraction of the rate limit is left
+API_RATE_PACE_BELOW = float(os.getenv('API_RATE_PACE_BELOW', '0.2'))
+API_RATE_RESERVE = int(os.getenv('API_RATE_RESERVE', '5'))  # requests to always keep in hand
+# GitHub wants content-creating requests one at a time, at least a second apart
+GITHUB_WRITE_INTERVAL = float(os.getenv('GITHUB_WRITE_INTERVAL', '1'))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Safe to send twice - POSTs aren't, the server may have created the thing already
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class ApiError(Exception):
+    """An API call came back with an error status"""
+    
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        super().__init__(f"{response.request.method} {urlparse(response.url).path} failed: {response.status_code}")
+
+
+def get_session(url):
+    """Shared session for the host in url, so connections get reused across calls"""
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _never_sent(error):
+    """Whether a connection error happened before the request went out (so a retry can't make a dupe)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    cause = error.args[0] if error.args else None
+    # Couldn't connect at all - as opposed to the server hanging up on a reused
+    # keep-alive connection, which can happen after it got the whole request
+    return isinstance(cause, MaxRetryError) and isinstance(cause.reason, (NewConnectionError, ConnectTimeoutError))
+
+
+def _retry_after(response):
+    """Seconds the server asked us to wait (Retry-After is either seconds or a date)"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate_resource(url):
+    """Which of GitHub's separate budgets a request comes out of (GitLab just has the one)"""
+    path = urlparse(url).path
+    if path.endswith('/graphql'):
+        return 'graphql'
+    if '/search/' in path:
+        return 'search'
+    return 'core'
+
+
+def _next_page(response, url, params):
+    """(url, params) for the page after this one, or None if this was the last.
+    
+    GitHub (and GitLab keyset pagination) send a Link: rel="next" URL that already
+    has every query param in it. GitLab offset pagination also sends X-Next-Page.
+    """
+    next_url = response.links.get('next', {}).get('url')
+    if next_url:
+        return next_url, None
+    next_page = response.headers.get('X-Next-Page')
+    if next_page:
+        return url, {**(params or {}), 'page': next_page}
+    return None
+
+
+def _backoff(attempt):
+    """Exponential backoff with full jitter so parallel workers don't retry in lockstep"""
+    return random.uniform(0, min(API_BACKOFF_MAX, API_BACKOFF * (2 ** attempt)))
+
+
+class RateLimiter:
+    """Keeps track of how much rate limit budget is left, per host + token + resource.
+    
+    Reads X-RateLimit-* (GitHub) and RateLimit-* (GitLab) off every response.
+    Runs at full speed while there's plenty left, spreads the rest out evenly
+    once it drops under API_RATE_PACE_BELOW, and sleeps until the reset when
+    it's gone. Writes can also be serialized with a minimum gap, which is what
+    GitHub asks for to stay clear of its secondary rate limits.
+    GitHub counts core, search and graphql separately (X-RateLimit-Resource),
+    so running out of one doesn't hold up the others.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+    
+    def _bucket(self, key):
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = {'remaining': None, 'limit': None, 'reset': None,
+                                     'paused_until': 0.0, 'next_at': 0.0,
+                                     'write_lock': threading.Lock(), 'next_write_at': 0.0}
+            return self.buckets[key]
+    
+    def _wait_for_budget(self, key, bucket):
+        while True:
+            now = time.time()
+            with self.lock:
+                wait = max(bucket['paused_until'], bucket['next_at']) - now
+                if wait <= 0:
+                    remaining, limit, reset = bucket['remaining'], bucket['limit'], bucket['reset']
+                    if remaining is not None and reset and limit:
+                        if remaining <= API_RATE_RESERVE and reset > now:
+                            # Used up - nothing to do but wait for the window to reset
+                            bucket['paused_until'] = reset + 1
+                            wait = reset + 1 - now
+                            print(f"  ⏸  Rate limit used up on {key[0]} ({key[2]}), waiting {wait:.0f}s for the reset...")
+                        elif remaining < limit * API_RATE_PACE_BELOW and reset > now:
+                            # Getting low - spread what's left over the rest of the window
+                            bucket['next_at'] = now + (reset - now) / max(1, remaining - API_RATE_RESERVE)
+                        # Count this request against our local copy until the next response lands
+                        bucket['remaining'] = max(0, remaining - 1)
+                    if wait <= 0:
+                        return
+            time.sleep(wait)
+    
+    @contextlib.contextmanager
+    def slot(self, key, write=False, write_interval=0.0):
+        """Hold this around a request - blocks until the budget allows it"""
+        bucket = self._bucket(key)
+        if not (write and write_interval):
+            self._wait_for_budget(key, bucket)
+            yield
+            return
+        
+        with bucket['write_lock']:
+            self._wait_for_budget(key, bucket)
+            gap = bucket['next_write_at'] - time.time()
+            if gap > 0:
+                time.sleep(gap)
+            try:
+                yield
+            finally:
+                bucket['next_write_at'] = time.time() + write_interval
+    
+    def update(self, key, response):
+        """Pick up the budget headers from a response"""
+        headers = response.headers
+        remaining = headers.get('X-RateLimit-Remaining', headers.get('RateLimit-Remaining'))
+        if remaining is None:
+            return
+        # GitHub says which budget it took this from, trust that over our guess from the URL
+        if headers.get('X-RateLimit-Resource'):
+            key = key[:2] + (headers['X-RateLimit-Resource'],)
+        bucket = self._bucket(key)
+        limit = headers.get('X-RateLimit-Limit', headers.get('RateLimit-Limit'))
+        reset = headers.get('X-RateLimit-Reset', headers.get('RateLimit-Reset'))
+        try:
+            with self.lock:
+                bucket['remaining'] = int(remaining)
+                bucket['limit'] = int(limit) if limit else None
+                bucket['reset'] = float(reset) if reset else None
+        except ValueError:
+            return
+        # Headroom for the metrics - token is the hashed id, not the token
+        metrics.gauge('api_rate_limit_remaining', bucket['remaining'], host=key[0], token=key[1], resource=key[2])
+        if bucket['limit']:
+            metrics.gauge('api_rate_limit_limit', bucket['limit'], host=key[0], token=key[1], resource=key[2])
+    
+    def pause(self, key, seconds):
+        """Stop everyone using this host + token + resource for a bit (after a rate limit response)"""
+        bucket = self._bucket(key)
+        with self.lock:
+            bucket['paused_until'] = max(bucket['paused_until'], time.time() + seconds)
+    
+    def budget(self):
+        """{(host, token id, resource): (remaining, limit, reset)} - handy for reporting"""
+        with self.lock:
+            return {key: (b['remaining'], b['limit'], b['reset']) for key, b in self.buckets.items()}
+
+
+# Shared by every ApiClient so all the workers draw from the same budget
+rate_limiter = RateLimiter()
+
+
+def _is_rate_limited(response):
+    """GitHub answers 403 (not 429) for both the primary and secondary limits"""
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    if response.headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in response.headers:
+        return True
+    return 'rate limit' in response.text.lower()
+
+
+def _rate_limit_wait(response, attempt):
+    """How long to back off after being rate limited"""
+    delay = _retry_after(response)
+    if delay is not None:
+        return delay
+    reset = response.headers.get('X-RateLimit-Reset', response.headers.get('RateLimit-Reset'))
+    remaining = response.headers.get('X-RateLimit-Remaining', response.headers.get('RateLimit-Remaining'))
+    if reset and remaining == '0':
+        return max(1.0, float(reset) - time.time() + 1)
+    # Secondary limit with no hints - GitHub says wait at least a minute, then back off more
+    return 60.0 * (2 ** attempt)
+
+
+class ApiClient:
+    """requests-style get/post/put/patch on top of the pooled sessions.
+    
+    Retries connection errors, timeouts and 429/5xx with backoff (honoring
+    Retry-After). POSTs only get retried on 429 and connection failures unless
+    you pass retry_post=True. After the last retry you get the last response
+    back (or the exception), same as a plain requests call.
+    
+    Every request goes through the shared rate_limiter. write_interval > 0 makes
+    POST/PUT/PATCH/DELETE go one at a time with at least that many seconds between.
+    """
+    
+    def __init__(self, headers=None, timeout=None, max_retries=None, write_interval=0.0, limiter=None):
+        self.headers = dict(headers or {})
+        self.timeout = timeout if timeout is not None else API_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else API_MAX_RETRIES
+        self.write_interval = write_interval
+        self.limiter = limiter or rate_limiter
+        # Budgets are per token, but there's no need to keep the token itself around as a key
+        auth = '|'.join(f"{k}={v}" for k, v in sorted(self.headers.items())
+                        if k.lower() in ('authorization', 'private-token'))
+        self.token_id = hashlib.sha256(auth.encode()).hexdigest()[:12] if auth else 'anonymous'
+    
+    def request(self, method, url, retry_post=False, **kwargs):
+        method = method.upper()
+        headers = {**self.headers, **kwargs.pop('headers', {})}
+        kwargs.setdefault('timeout', self.timeout)
+        retry_5xx = method in IDEMPOTENT_METHODS or retry_post
+        session = get_session(url)
+        key = (urlparse(url).netloc, self.token_id, _rate_resource(url))
+        write = method not in ('GET', 'HEAD', 'OPTIONS')
+        labels = {'host': key[0], 'method': method, 'endpoint': endpoint(url)}
+        
+        attempt = 0
+        while True:
+            try:
+                with self.limiter.slot(key, write, self.write_interval):
+                    started = time.perf_counter()
+                    response = session.request(method, url, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.inc('api_requests_total', status=type(e).__name__, **labels)
+                # A POST that timed out or got cut off might've gone through, don't risk a dupe -
+                # only retry those if we never got as far as sending them
+                if attempt >= self.max_retries or (not retry_5xx and not _never_sent(e)):
+                    raise
+                delay = _backoff(attempt)
+                metrics.inc('api_retries_total', reason=type(e).__name__, **labels)
+                print(f"  ⏳ {type(e).__name__} on {method} {urlparse(url).path}, retrying in {delay:.1f}s...")
+            else:
+                self._count(labels, response, time.perf_counter() - started)
+                self.limiter.update(key, response)
+                if _is_rate_limited(response):
+                    if attempt >= self.max_retries:
+                        return response
+                    # Rate limits are per token (and resource), so hold off every request using it - not just this one
+                    delay = _rate_limit_wait(response, attempt)
+                    self.limiter.pause(key, delay)
+                    metrics.inc('api_retries_total', reason='rate_limited', **labels)
+                    metrics.inc('api_rate_limit_wait_seconds_total', delay, host=key[0])
+                    print(f"  ⏸  Rate limited ({response.status_code}) on {key[0]}, waiting {delay:.0f}s...")
+                    attempt += 1
+                    continue
+                
+                retryable = response.status_code in RETRY_STATUSES and retry_5xx
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                delay = _retry_after(response)
+                if delay is None:
+                    delay = _backoff(attempt)
+                metrics.inc('api_retries_total', reason=str(response.status_code), **labels)
+                print(f"  ⏳ {response.status_code} on {method} {urlparse(url).path}, retrying in {delay:.1f}s...")
+            
+            time.sleep(delay)
+            attempt += 1
+    
+    @staticmethod
+    def _count(labels, response, seconds):
+        """Feed one response into the metrics"""
+        metrics.inc('api_requests_total', status=response.status_code, **labels)
+        metrics.inc('api_request_seconds_total', seconds, **labels)
+        metrics.inc('api_bytes_received_total', len(response.content), host=labels['host'])
+        body = response.request.body if response.request is not None else None
+        if body:
+            metrics.inc('api_bytes_sent_total', len(body), host=labels['host'])
+    
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+    
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+    
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+    
+    def paginate(self, url, params=None, per_page=None):
+        """Yield every item from a list endpoint, following pages to the end.
+        
+        Items come out as each page arrives, and the next page is already being
+        fetched while you work on the current one - only ~2 pages are ever held
+        in memory no matter how big the list is. Raises ApiError on a bad page.
+        For GitLab keyset pagination pass params={'pagination': 'keyset', 'order_by': 'id'}.
+        """
+        params = {**(params or {}), 'per_page': per_page or API_PER_PAGE}
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            # copy_context so anything printed from the prefetch thread keeps the caller's context
+            pending = pool.submit(contextvars.copy_context().run, self.get, url, params=params)
+            while pending is not None:
+                response = pending.result()
+                if response.status_code != 200:
+                    raise ApiError(response)
+                
+                following = _next_page(response, url, params)
+                if following:
+                    url, params = following
+                    pending = pool.submit(contextvars.copy_context().run, self.get, url, params=params)
+                else:
+                    pending = None
+                
+                yield from response.json()
@@ -0,0 +1,800 @@
+#!/usr/bin/env python3
+# Benchmarks for the sync scripts - runs entirely on this machine, no network, no tokens
+# Fake GitHub v3 / GitLab v4 APIs on localhost (pagination, rate limit headers,
+# optional latency) plus throwaway bare git repos, then times the real sync code
+# against them at a few sizes. Results get appended to a JSON lines file so you
+# can see if something got slower.
+#
+#   python benchmark.py                          # every scenario at 10 and 1000
+#   python benchmark.py issues comments --scale 10,1000,50000
+#   python benchmark.py code --latency 50 --verbose
+
+import argparse
+import contextlib
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import sync_repos
+from api_client import close_sessions
+from sync_activities import ActivitySyncer
+from sync_repos import EventQueue, RepoSyncer, SyncServer
+from sync_state import SyncState, pair_key
+
+# Where results go (one JSON object per measurement)
+SYNC_BENCH_RESULTS = os.getenv('SYNC_BENCH_RESULTS', 'benchmarks.jsonl')
+SYNC_BENCH_SCALES = os.getenv('SYNC_BENCH_SCALES', '10,1000')  # 50000 works too, it just takes a while
+SYNC_BENCH_LATENCY = float(os.getenv('SYNC_BENCH_LATENCY', '0'))  # ms added to every fake API response
+# Fake rate limit per side - high by default so it doesn't throttle, set it to 5000 to feel GitHub's
+SYNC_BENCH_RATE_LIMIT = int(os.getenv('SYNC_BENCH_RATE_LIMIT', '1000000'))
+SYNC_BENCH_RATE_WINDOW = int(os.getenv('SYNC_BENCH_RATE_WINDOW', '60'))  # seconds until the limit resets
+SYNC_BENCH_COMMITS = int(os.getenv('SYNC_BENCH_COMMITS', '200'))  # commits in the fake repo's history
+# Report anything this much slower than the last run with the same settings
+SYNC_BENCH_REGRESSION = float(os.getenv('SYNC_BENCH_REGRESSION', '0.1'))
+
+GITHUB_REPO = 'bench/project'
+GITLAB_REPO = 'bench/project'
+GITLAB_PROJECT_ID = 1
+# Seeded items get updated_at = this + their index in seconds, so since/updated_after filtering works
+SEED_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _stamp(when):
+    return when.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _now():
+    return _stamp(datetime.now(timezone.utc))
+
+
+class FakeApi:
+    """Little in-memory API server. Subclasses fill in handle() for GitHub / GitLab.
+    
+    Every response sleeps `latency` ms first and carries rate limit headers.
+    Once the limit is used up requests get refused until the window resets,
+    the same way the real thing does it.
+    """
+    
+    def __init__(self, latency=None, rate_limit=None, rate_window=None):
+        self.latency = (SYNC_BENCH_LATENCY if latency is None else latency) / 1000
+        self.rate_limit = rate_limit or SYNC_BENCH_RATE_LIMIT
+        self.rate_window = rate_window or SYNC_BENCH_RATE_WINDOW
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.calls = {}
+        self.remaining = self.rate_limit
+        self.reset_at = time.time() + self.rate_window
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+    
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+    
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def reset_calls(self):
+        with self.lock:
+            self.calls = {}
+    
+    def total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+    
+    def _take_budget(self):
+        """Count one request against the limit. Returns (allowed, headers)"""
+        with self.lock:
+            now = time.time()
+            if now >= self.reset_at:
+                self.remaining = self.rate_limit
+                self.reset_at = now + self.rate_window
+            allowed = self.remaining > 0
+            if allowed:
+                self.remaining -= 1
+            return allowed, self.rate_headers(self.rate_limit, self.remaining, int(self.reset_at))
+    
+    def rate_headers(self, limit, remaining, reset):
+        raise NotImplementedError
+    
+    def rate_limited(self, headers):
+        """(status, body, headers) for a request over the limit"""
+        raise NotImplementedError
+    
+    def handle(self, method, path, query, body):
+        """(status, body, headers) for one request"""
+        raise NotImplementedError
+    
+    def _handler(self):
+        api = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+            # Headers and body go out as separate writes - without this every response
+            # sits out a ~40ms delayed ACK and that's all the benchmark would measure
+            disable_nagle_algorithm = True
+            
+            def log_message(self, *args):
+                pass  # way too chatty
+            
+            def _serve(self, method):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                with api.lock:
+                    api.calls[method] = api.calls.get(method, 0) + 1
+                if api.latency:
+                    time.sleep(api.latency)
+                
+                allowed, headers = api._take_budget()
+                if allowed:
+                    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                    status, body, extra = api.handle(method, url.path, query, json.loads(raw) if raw else {})
+                    headers.update(extra)
+                else:
+                    status, body, headers = api.rate_limited(headers)
+                
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, str(value))
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def do_GET(self):
+                self._serve('GET')
+            
+            def do_POST(self):
+                self._serve('POST')
+            
+            def do_PUT(self):
+                self._serve('PUT')
+            
+            def do_PATCH(self):
+                self._serve('PATCH')
+        
+        return Handler
+    
+    def page(self, path, items, query):
+        """Slice out the page asked for. Returns (items, headers) with the next page link if there is one"""
+        per_page = min(int(query.get('per_page', 30)), 100)
+        number = max(1, int(query.get('page', 1)))
+        chunk = items[(number - 1) * per_page:number * per_page]
+        headers = {}
+        if number * per_page < len(items):
+            headers = self.next_page_headers(path, query, number + 1, len(items))
+        return chunk, headers
+    
+    def next_page_headers(self, path, query, number, total):
+        # Both sides send a Link header, GitLab's are below
+        params = '&'.join(f"{k}={v}" for k, v in {**query, 'page': number}.items())
+        return {'Link': f'<{self.url}{path}?{params}>; rel="next"'}
+
+
+class FakeGitHub(FakeApi):
+    """The GitHub v3 endpoints the scripts use, for one repo.
+    
+    With graphql=True there's also just enough of /graphql for github_graphql.py,
+    without it /graphql is a 404 like on an old GitHub Enterprise.
+    """
+    
+    def __init__(self, graphql=False, **kwargs):
+        super().__init__(**kwargs)
+        self.graphql = graphql
+        self.issues = []
+        self.labels = []
+        self.milestones = []
+        self.comments = []
+    
+    def rate_headers(self, limit, remaining, reset):
+        return {'X-RateLimit-Limit': limit, 'X-RateLimit-Remaining': remaining, 'X-RateLimit-Reset': reset}
+    
+    def rate_limited(self, headers):
+        return 403, {'message': 'API rate limit exceeded'}, headers
+    
+    def issue_url(self, number):
+        return f"https://github.com/{GITHUB_REPO}/issues/{number}"
+    
+    def seed(self, issues=0, labels=0, milestones=0, comments=0):
+        """Fill the repo up. Comments get spread evenly over the issues"""
+        for i in range(issues):
+            number = len(self.issues) + 1
+            self.issues.append({
+                'number': number, 'title': f"Bench issue {number}", 'body': f"Body of issue {number}",
+                'state': 'open', 'labels': [], 'html_url': self.issue_url(number),
+                'updated_at': _stamp(SEED_TIME + timedelta(seconds=i)),
+            })
+        for i in range(labels):
+            self.labels.append({'name': f"label-{i + 1}", 'color': f"{i % 0xffffff:06x}", 'description': ''})
+        for i in range(milestones):
+            self.milestones.append({
+                'number': i + 1, 'title': f"Milestone {i + 1}", 'description': '', 'state': 'open',
+                'due_on': _stamp(SEED_TIME + timedelta(days=i)),
+            })
+        for i in range(comments):
+            number = self.issues[i % len(self.issues)]['number']
+            comment_id = next(self.ids)
+            self.comments.append({
+                'id': comment_id, 'issue_number': number, 'body': f"Comment {i + 1}",
+                'user': {'login': 'bench'},
+                'issue_url': f"{self.url}/repos/{GITHUB_REPO}/issues/{number}",
+                'html_url': f"{self.issue_url(number)}#issuecomment-{comment_id}",
+                'updated_at': _stamp(SEED_TIME + timedelta(seconds=i)),
+            })
+    
+    def handle(self, method, path, query, body):
+        if path == '/graphql' and method == 'POST' and self.graphql:
+            return 200, {'data': self.run_graphql(body['query'], body.get('variables') or {})}, {}
+        prefix = f"/repos/{GITHUB_REPO}/"
+        if not path.startswith(prefix):
+            return 404, {'message': 'Not Found'}, {}
+        rest = path[len(prefix):]
+        
+        if rest == 'issues' and method == 'GET':
+            issues = self.issues
+            if 'since' in query:
+                issues = [i for i in issues if i['updated_at'] >= query['since']]
+            if query.get('sort') == 'updated':
+                issues = sorted(issues, key=lambda i: i['updated_at'], reverse=query.get('direction') != 'asc')
+            return (200, *self.page(path, issues, query))
+        if rest == 'issues' and method == 'POST':
+            with self.lock:
+                number = len(self.issues) + 1
+                issue = {'number': number, 'title': body['title'], 'body': body.get('body', ''),
+                         'state': 'open', 'labels': [{'name': l} for l in body.get('labels', [])],
+                         'html_url': self.issue_url(number), 'updated_at': _now()}
+                self.issues.append(issue)
+            return 201, issue, {}
+        
+        if rest == 'issues/comments' and method == 'GET':
+            comments = self.comments
+            if 'since' in query:
+                comments = [c for c in comments if c['updated_at'] >= query['since']]
+            return (200, *self.page(path, comments, query))
+        
+        match = re.fullmatch(r'issues/(\d+)', rest)
+        if match and method in ('GET', 'PATCH'):
+            number = int(match.group(1))
+            if not 0 < number <= len(self.issues):
+                return 404, {'message': 'Not Found'}, {}
+            if method == 'GET':
+                return 200, self.issues[number - 1], {}
+            with self.lock:
+                issue = self.issues[number - 1]
+                issue.update({k: v for k, v in body.items() if k != 'labels'}, updated_at=_now())
+                if 'labels' in body:
+                    issue['labels'] = [{'name': l} for l in body['labels']]
+            return 200, issue, {}
+        
+        match = re.fullmatch(r'issues/(\d+)/comments', rest)
+        if match and method == 'GET':
+            number = int(match.group(1))
+            comments = [c for c in self.comments if c['issue_number'] == number]
+            if 'since' in query:
+                comments = [c for c in comments if c['updated_at'] >= query['since']]
+            return (200, *self.page(path, comments, query))
+        
+        for name, items in (('labels', self.labels), ('milestones', self.milestones)):
+            if rest == name and method == 'GET':
+                return (200, *self.page(path, items, query))
+        
+        return 404, {'message': 'Not Found'}, {}
+
+
+    def run_graphql(self, query, variables):
+        """Answers the queries in github_graphql.py - which one it is gets picked by what it asks for"""
+        start = int(variables.get('cursor') or 0)
+        
+        def connection(items, size=100, start=0):
+            nodes = items[start:start + size]
+            end = start + len(nodes)
+            return {'pageInfo': {'hasNextPage': end < len(items), 'endCursor': str(end)}, 'nodes': nodes}
+        
+        def comment_node(comment):
+            return {'databaseId': comment['id'], 'body': comment['body'], 'updatedAt': comment['updated_at'],
+                    'url': comment['html_url'], 'author': comment['user']}
+        
+        def comments_of(numbers):
+            found = {number: [] for number in numbers}
+            for comment in self.comments:
+                if comment['issue_number'] in found:
+                    found[comment['issue_number']].append(comment_node(comment))
+            return found
+        
+        if 'issue(number' in query:
+            comments = comments_of([variables['number']])[variables['number']]
+            return {'repository': {'issue': {'comments': connection(comments, start=start)}}}
+        if 'issues(' in query:
+            issues = sorted(self.issues, key=lambda i: i['updated_at'])
+            if variables.get('since'):
+                issues = [i for i in issues if i['updated_at'] >= variables['since']]
+            page = connection(issues, start=start)
+            comments = comments_of([i['number'] for i in page['nodes']]) if variables.get('withComments') else {}
+            nodes = []
+            for issue in page['nodes']:
+                node = {'number': issue['number'], 'title': issue['title'], 'body': issue['body'],
+                        'state': issue['state'].upper(), 'url': issue['html_url'], 'updatedAt': issue['updated_at'],
+                        'labels': {'nodes': issue['labels']}, 'milestone': issue.get('milestone')}
+                if variables.get('withComments'):
+                    node['comments'] = connection(comments[issue['number']], size=variables['comments'])
+                nodes.append(node)
+            page['nodes'] = nodes
+            return {'repository': {'issues': page}}
+        if 'labels(' in query:
+            return {'repository': {'labels': connection(self.labels, start=start)}}
+        if 'milestones(' in query:
+            milestones = [{'number': m['number'], 'title': m['title'], 'description': m['description'],
+                           'state': m['state'].upper(), 'dueOn': m['due_on']} for m in self.milestones]
+            return {'repository': {'milestones': connection(milestones, start=start)}}
+        return {'repository': {'id': 'R_1'}}
+
+
+class FakeGitLab(FakeApi):
+    """The GitLab v4 endpoints the scripts use, for one project"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.issues = []
+        self.labels = []
+        self.milestones = []
+        self.notes = {}  # issue iid -> notes
+        self.names = {'labels': set(), 'milestones': set()}  # for the "already exists" check
+    
+    @property
+    def api_base(self):
+        return f"{self.url}/api/v4"
+    
+    def rate_headers(self, limit, remaining, reset):
+        return {'RateLimit-Limit': limit, 'RateLimit-Remaining': remaining, 'RateLimit-Reset': reset}
+    
+    def rate_limited(self, headers):
+        return 429, {'message': 'Retry later'}, {**headers, 'Retry-After': max(1, int(self.reset_at - time.time()))}
+    
+    def next_page_headers(self, path, query, number, total):
+        # Offset pagination - just X-Next-Page, no Link, so both ways of paging get exercised
+        return {'X-Next-Page': number, 'X-Total': total}
+    
+    def seed_issues(self, count, synced_from=None):
+        """Add issues, optionally with the "Synced from GitHub" footer pointing at synced_from(iid)"""
+        for i in range(count):
+            iid = len(self.issues) + 1
+            description = f"Body of issue {iid}"
+            if synced_from:
+                description += f"\n\n---\n*Synced from GitHub: {synced_from(iid)}*"
+            self.issues.append({
+                'iid': iid, 'id': next(self.ids), 'title': f"[GitHub] Bench issue {iid}",
+                'description': description, 'state': 'opened', 'labels': [],
+                'web_url': f"https://gitlab.com/{GITLAB_REPO}/-/issues/{iid}",
+                'updated_at': _stamp(SEED_TIME + timedelta(seconds=i)),
+            })
+    
+    def handle(self, method, path, query, body):
+        prefix = '/api/v4/projects/'
+        if not path.startswith(prefix):
+            return 404, {'message': '404 Not Found'}, {}
+        project, _, rest = path[len(prefix):].partition('/')
+        if project not in (str(GITLAB_PROJECT_ID), GITLAB_REPO.replace('/', '%2F'), GITLAB_REPO):
+            return 404, {'message': '404 Project Not Found'}, {}
+        
+        if rest == '' and method == 'GET':
+            return 200, {'id': GITLAB_PROJECT_ID, 'path_with_namespace': GITLAB_REPO}, {}
+        
+        if rest == 'issues' and method == 'GET':
+            issues = self.issues
+            if 'updated_after' in query:
+                issues = [i for i in issues if i['updated_at'] > query['updated_after']]
+            if query.get('order_by') == 'updated_at':
+                issues = sorted(issues, key=lambda i: i['updated_at'], reverse=query.get('sort') != 'asc')
+            if 'search' in query:
+                issues = [i for i in issues if query['search'] in i['title'] + i['description']]
+            return (200, *self.page(path, issues, query))
+        if rest == 'issues' and method == 'POST':
+            with self.lock:
+                iid = len(self.issues) + 1
+                labels = body.get('labels') or ''
+                issue = {'iid': iid, 'id': next(self.ids), 'title': body['title'],
+                         'description': body.get('description', ''), 'state': 'opened',
+                         'labels': labels.split(',') if labels else [],
+                         'milestone': {'id': body['milestone_id']} if body.get('milestone_id') else None,
+                         'web_url': f"https://gitlab.com/{GITLAB_REPO}/-/issues/{iid}", 'updated_at': _now()}
+                self.issues.append(issue)
+            return 201, issue, {}
+        
+        match = re.fullmatch(r'issues/(\d+)', rest)
+        if match and method == 'PUT':
+            iid = int(match.group(1))
+            if not 0 < iid <= len(self.issues):
+                return 404, {'message': '404 Not found'}, {}
+            with self.lock:
+                issue = self.issues[iid - 1]
+                event = body.pop('state_event', None)
+                if event:
+                    issue['state'] = 'closed' if event == 'close' else 'opened'
+                if 'labels' in body:
+                    labels = body.pop('labels')
+                    issue['labels'] = labels.split(',') if labels else []
+                if 'milestone_id' in body:
+                    milestone_id = body.pop('milestone_id')
+                    issue['milestone'] = {'id': milestone_id} if milestone_id else None
+                issue.update(body, updated_at=_now())
+            return 200, issue, {}
+        
+        match = re.fullmatch(r'issues/(\d+)/notes', rest)
+        if match:
+            notes = self.notes.setdefault(int(match.group(1)), [])
+            if method == 'GET':
+                return (200, *self.page(path, notes, query))
+            note = {'id': next(self.ids), 'body': body['body'], 'created_at': _now()}
+            with self.lock:
+                notes.append(note)
+            return 201, note, {}
+        
+        for name, items, key in (('labels', self.labels, 'name'), ('milestones', self.milestones, 'title')):
+            if rest == name and method == 'GET':
+                return (200, *self.page(path, items, query))
+            if rest == name and method == 'POST':
+                with self.lock:
+                    if body[key] in self.names[name]:
+                        return 409, {'message': f"{name[:-1].capitalize()} already exists"}, {}
+                    self.names[name].add(body[key])
+                    item = {**body, 'id': next(self.ids)}
+                    items.append(item)
+                return 201, item, {}
+            match = re.fullmatch(name + r'/(\d+)', rest)
+            if match and method == 'PUT':
+                item = next((i for i in items if i['id'] == int(match.group(1))), None)
+                if item is None:
+                    return 404, {'message': '404 Not found'}, {}
+                with self.lock:
+                    event = body.pop('state_event', None)
+                    if event:
+                        item['state'] = 'closed' if event == 'close' else 'active'
+                    item.update(body)
+                return 200, item, {}
+        
+        return 404, {'message': '404 Not Found'}, {}
+
+
+def make_bare_repo(path, branches=1, commits=None, tags=0):
+    """Create a bare repo with a `commits`-long main history and extra branches/tags spread over it.
+    
+    Uses git fast-import, so even 50k refs only take a few seconds.
+    """
+    commits = max(1, commits or SYNC_BENCH_COMMITS)
+    subprocess.run(['git', 'init', '-q', '--bare', path], check=True)
+    
+    lines = []
+    for i in range(commits):
+        content = f"line {i}\n".encode()
+        message = f"Commit {i + 1}\n".encode()
+        lines.append(b'commit refs/heads/main\n')
+        lines.append(f"mark :{i + 1}\n".encode())
+        lines.append(f"committer Bench <bench@example.com> {1700000000 + i} +0000\n".encode())
+        lines.append(f"data {len(message)}\n".encode() + message)
+        lines.append(f"M 644 inline file{i % 50}.txt\n".encode())
+        lines.append(f"data {len(content)}\n".encode() + content + b'\n')
+    # main is one of the branches
+    for i in range(max(0, branches - 1)):
+        lines.append(f"reset refs/heads/branch-{i + 1:05d}\nfrom :{i % commits + 1}\n\n".encode())
+    for i in range(tags):
+        lines.append(f"reset refs/tags/v{i + 1}\nfrom :{i % commits + 1}\n\n".encode())
+    
+    subprocess.run(['git', 'fast-import', '--quiet'], input=b''.join(lines), cwd=path, check=True)
+    # Servers keep their refs packed
+    subprocess.run(['git', 'pack-refs', '--all'], cwd=path, check=True)
+    return path
+
+
+# ---- Scenarios ----
+# Each one sets things up at a given scale and returns (run, check): run() does one
+# sync pass, check() says whether the target ended up with everything.
+
+def _api_syncers(github, gitlab, state, activities=False):
+    kwargs = dict(github_repo=GITHUB_REPO, gitlab_repo=GITLAB_REPO, github_token='bench', gitlab_token='bench',
+                  github_api_base=github.url, gitlab_api_base=gitlab.api_base, state=state,
+                  graphql=github.graphql)
+    syncer = ActivitySyncer(**kwargs) if activities else RepoSyncer(**kwargs)
+    # No secondary rate limit to stay clear of here, don't wait a second between GitHub writes
+    syncer.github.write_interval = 0
+    return syncer
+
+
+def scenario_code(scale, workdir, github, gitlab, state):
+    """sync_code GitHub -> GitLab with `scale` branches (and a tag per 10 branches)"""
+    source = make_bare_repo(os.path.join(workdir, 'github.git'), branches=scale, tags=scale // 10)
+    target = os.path.join(workdir, 'gitlab.git')
+    subprocess.run(['git', 'init', '-q', '--bare', target], check=True)
+    syncer = RepoSyncer(github_repo=GITHUB_REPO, gitlab_repo=GITLAB_REPO, github_git_url=source,
+                        gitlab_git_url=target, cache_dir=os.path.join(workdir, 'cache'), state=state)
+    
+    def check():
+        refs = subprocess.run(['git', 'for-each-ref', '--format=%(refname)'], cwd=target,
+                              capture_output=True, text=True, check=True).stdout.split()
+        return len(refs) == scale + scale // 10
+    
+    return (lambda: syncer.sync_code('github-to-gitlab')), check
+
+
+def scenario_issues(scale, workdir, github, gitlab, state):
+    """sync_issues both ways with `scale` new issues on GitHub"""
+    github.seed(issues=scale)
+    syncer = _api_syncers(github, gitlab, state)
+    return (lambda: syncer.sync_issues('both')), (lambda: len(gitlab.issues) == scale)
+
+
+def scenario_labels(scale, workdir, github, gitlab, state):
+    """sync_labels with `scale` labels on GitHub"""
+    github.seed(labels=scale)
+    syncer = _api_syncers(github, gitlab, state, activities=True)
+    return syncer.sync_labels, (lambda: len(gitlab.labels) == scale)
+
+
+def scenario_milestones(scale, workdir, github, gitlab, state):
+    """sync_milestones with `scale` milestones on GitHub"""
+    github.seed(milestones=scale)
+    syncer = _api_syncers(github, gitlab, state, activities=True)
+    return syncer.sync_milestones, (lambda: len(gitlab.milestones) == scale)
+
+
+def _seed_synced_issues(github, gitlab, state, count):
+    # Issues already synced (and in the db), so comments have somewhere to go
+    github.seed(issues=count)
+    gitlab.seed_issues(count, synced_from=github.issue_url)
+    pair = pair_key(GITHUB_REPO, GITLAB_REPO)
+    for issue in github.issues:
+        state.put(pair, 'issue', 'github', issue['number'], issue['number'])
+
+
+def scenario_comments(scale, workdir, github, gitlab, state):
+    """sync_all_comments with `scale` comments spread over scale/10 issues"""
+    _seed_synced_issues(github, gitlab, state, max(1, scale // 10))
+    github.seed(comments=scale)
+    syncer = _api_syncers(github, gitlab, state, activities=True)
+    return syncer.sync_all_comments, (lambda: sum(len(n) for n in gitlab.notes.values()) == scale)
+
+
+def scenario_issue_comments(scale, workdir, github, gitlab, state):
+    """sync_comments for a single issue with `scale` comments on it"""
+    _seed_synced_issues(github, gitlab, state, 1)
+    github.seed(comments=scale)
+    syncer = _api_syncers(github, gitlab, state, activities=True)
+    return (lambda: syncer.sync_comments(1)), (lambda: len(gitlab.notes.get(1, [])) == scale)
+
+
+class _WatchedQueue(EventQueue):
+    """EventQueue that keeps score: which jobs got handed out, and the most ever running for one pair"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jobs = []
+        self.running = {}
+        self.overlap = 0
+    
+    def get(self):
+        job = super().get()
+        if job is not None:
+            with self.cond:
+                index = job[0][0]
+                self.jobs.append(job[0])
+                self.running[index] = self.running.get(index, 0) + 1
+                self.overlap = max(self.overlap, self.running[index])
+        return job
+    
+    def done(self, key):
+        with self.cond:
+            self.running[key[0]] -= 1
+        super().done(key)
+    
+    def idle(self):
+        with self.cond:
+            return not self.pending and not self.busy
+
+
+def scenario_serve(scale, workdir, github, gitlab, state):
+    """Serve mode: a signed push webhook per branch and an issues webhook per issue, `scale` of each.
+    
+    They all land within the debounce window, so it should come down to one code
+    job and one issues job, never both at once (same pair). The time includes
+    waiting out the debounce and shutting the server down (up to half a second each).
+    """
+    source = make_bare_repo(os.path.join(workdir, 'github.git'), branches=scale)
+    target = os.path.join(workdir, 'gitlab.git')
+    subprocess.run(['git', 'init', '-q', '--bare', target], check=True)
+    github.seed(issues=scale)
+    branches = subprocess.run(['git', 'for-each-ref', '--format=%(refname)', 'refs/heads'], cwd=source,
+                              capture_output=True, text=True, check=True).stdout.split()
+    config = {
+        'workers': 2, 'debounce': 0.5, 'debounce_max': 600,
+        'pairs': [{'github': GITHUB_REPO, 'gitlab': GITLAB_REPO, 'sync': 'all', 'direction': 'github-to-gitlab',
+                   'github_git_url': source, 'gitlab_git_url': target, 'cache_dir': os.path.join(workdir, 'cache'),
+                   'github_api_base': github.url, 'gitlab_api_base': gitlab.api_base, 'graphql': github.graphql}],
+    }
+    secret = 'bench-secret'
+    seen = {}
+    
+    def send(url, event, payload, signature=None):
+        body = json.dumps(payload).encode()
+        signature = signature or 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return requests.post(url, data=body, timeout=30, headers={
+            'X-GitHub-Event': event, 'X-Hub-Signature-256': signature, 'Content-Type': 'application/json'})
+    
+    def run():
+        repo = {'full_name': GITHUB_REPO}
+        old_secret, sync_repos.GITHUB_WEBHOOK_SECRET = sync_repos.GITHUB_WEBHOOK_SECRET, secret
+        server = SyncServer(config, host='127.0.0.1', port=0, state=state)
+        server.queue = _WatchedQueue(config['debounce'], config['debounce_max'])
+        server.start()
+        try:
+            url = f"http://127.0.0.1:{server.port}/"
+            seen['rejected'] = send(url, 'push', {'ref': branches[0], 'repository': repo},
+                                    signature='sha256=0').status_code == 401
+            for i in range(scale):
+                # Interleaved, so both keys for the pair are waiting at the same time
+                send(url, 'push', {'ref': branches[i % len(branches)], 'repository': repo})
+                send(url, 'issues', {'action': 'opened', 'issue': {'number': i + 1}, 'repository': repo})
+            while not server.queue.idle():
+                time.sleep(0.01)
+        finally:
+            server.stop()
+            sync_repos.GITHUB_WEBHOOK_SECRET = old_secret
+        seen['jobs'] = sorted(kind for _, kind, _ in server.queue.jobs)
+        seen['overlap'] = server.queue.overlap
+    
+    def check():
+        refs = subprocess.run(['git', 'for-each-ref', '--format=%(refname)'], cwd=target,
+                              capture_output=True, text=True, check=True).stdout.split()
+        return (seen['rejected'] and seen['jobs'] == ['code', 'issues'] and seen['overlap'] == 1
+                and len(refs) == scale and len(gitlab.issues) == scale)
+    
+    return run, check
+
+
+SCENARIOS = {
+    'code': scenario_code,
+    'issues': scenario_issues,
+    'labels': scenario_labels,
+    'milestones': scenario_milestones,
+    'comments': scenario_comments,
+    'issue-comments': scenario_issue_comments,
+    'serve': scenario_serve,
+}
+
+
+# ---- Running and recording ----
+
+def _version():
+    """The commit being benchmarked (with -dirty if there are local changes)"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path=None):
+    path = path or SYNC_BENCH_RESULTS
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _same_setup(a, b):
+    return all(a.get(k) == b.get(k) for k in ('scenario', 'scale', 'pass', 'latency_ms', 'rate_limit', 'graphql'))
+
+
+def run_scenario(name, scale, latency=None, verbose=False, graphql=False):
+    """Run one scenario twice - cold (everything new) then warm (nothing changed). Returns the records"""
+    latency = SYNC_BENCH_LATENCY if latency is None else latency
+    github = FakeGitHub(latency=latency, graphql=graphql).start()
+    gitlab = FakeGitLab(latency=latency).start()
+    records = []
+    with tempfile.TemporaryDirectory(prefix='sync-bench-') as workdir:
+        state = SyncState(os.path.join(workdir, 'state.db'))
+        try:
+            run, check = SCENARIOS[name](scale, workdir, github, gitlab, state)
+            for label in ('cold', 'warm'):
+                github.reset_calls()
+                gitlab.reset_calls()
+                with open(os.devnull, 'w') as devnull:
+                    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)
+                    with quiet:
+                        started = time.perf_counter()
+                        run()
+                        seconds = time.perf_counter() - started
+                records.append({
+                    'time': _now(), 'version': _version(), 'scenario': name, 'scale': scale, 'pass': label,
+                    'seconds': round(seconds, 4), 'ok': check(),
+                    'api_calls': github.total_calls() + gitlab.total_calls(),
+                    'api_calls_by_method': {side: dict(api.calls) for side, api in
+                                            (('github', github), ('gitlab', gitlab))},
+                    'latency_ms': latency, 'rate_limit': SYNC_BENCH_RATE_LIMIT, 'graphql': graphql,
+                    'python': platform.python_version(), 'platform': platform.platform(),
+                })
+        finally:
+            state.close()
+            github.stop()
+            gitlab.stop()
+            close_sessions()
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the sync scripts against local fake APIs and repos')
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"any of {', '.join(SCENARIOS)} (default: all of them)")
+    parser.add_argument('--scale', default=SYNC_BENCH_SCALES, help='comma separated sizes, e.g. 10,1000,50000')
+    parser.add_argument('--latency', type=float, default=SYNC_BENCH_LATENCY, help='ms added to every API response')
+    parser.add_argument('--results', default=SYNC_BENCH_RESULTS, help='JSON lines file to append results to')
+    parser.add_argument('--no-save', action='store_true', help="just print, don't record anything")
+    parser.add_argument('--graphql', action='store_true', help='read GitHub over GraphQL (github_graphql.py)')
+    parser.add_argument('--verbose', action='store_true', help="show the syncs' own output")
+    args = parser.parse_args()
+    
+    scenarios = args.scenarios or list(SCENARIOS)
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(unknown)} (pick from {', '.join(SCENARIOS)})")
+    scales = [int(s) for s in args.scale.split(',') if s.strip()]
+    history = load_results(args.results)
+    regressions = []
+    
+    print(f"⏱️  Benchmarking {', '.join(scenarios)} at {', '.join(map(str, scales))} "
+          f"(latency {args.latency:g}ms{', GraphQL' if args.graphql else ''})\n")
+    
+    for name in scenarios:
+        for scale in scales:
+            try:
+                records = run_scenario(name, scale, args.latency, args.verbose, args.graphql)
+            except Exception as e:
+                print(f"❌ Error in {name} @ {scale}: {e}")
+                continue
+            
+            for record in records:
+                line = (f"  {'✅' if record['ok'] else '⚠️ '} {name:<15} {scale:>6} {record['pass']:<5}"
+                        f" {record['seconds']:9.3f}s {record['api_calls']:>7} calls")
+                # Compare with the last run that had the same settings
+                previous = next((r for r in reversed(history) if _same_setup(r, record)), None)
+                if previous and previous['seconds']:
+                    change = record['seconds'] / previous['seconds'] - 1
+                    line += f"  {change:+.0%} vs {previous.get('version') or previous['time']}"
+                    if change > SYNC_BENCH_REGRESSION and record['seconds'] - previous['seconds'] > 0.05:
+                        line += '  🐢'
+                        regressions.append(record)
+                print(line)
+            
+            if not args.no_save:
+                with open(args.results, 'a') as f:
+                    for record in records:
+                        f.write(json.dumps(record) + '\n')
+    
+    if not args.no_save:
+        print(f"\n📝 Results appended to {args.results}")
+    if regressions:
+        print(f"🐢 {len(regressions)} slower than last time by more than {SYNC_BENCH_REGRESSION:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
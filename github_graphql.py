@@ -0,0 +1,223 @@
+# Optional GitHub GraphQL source for the issue / comment / label / milestone reads
+# One query gets 100 issues with their labels, milestone and first comments, so
+# reading a big tracker takes dozens of requests instead of thousands.
+# Everything comes back shaped like the REST v3 responses, so the sync code
+# doesn't care where it came from. Falls back to REST (see available()) on
+# servers without GraphQL, like older GitHub Enterprise.
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api_client import ApiClient, ApiError
+
+# Set to 1 to read from GraphQL instead of REST (needs a token - GraphQL has no anonymous access)
+GITHUB_GRAPHQL = os.getenv('GITHUB_GRAPHQL', '0') == '1'
+# Comments fetched along with each issue - issues with more get the rest in follow-up queries
+GITHUB_GRAPHQL_COMMENTS = min(100, int(os.getenv('GITHUB_GRAPHQL_COMMENTS', '50')))
+
+PAGE_INFO = 'pageInfo { hasNextPage endCursor }'
+COMMENT_FIELDS = 'databaseId body updatedAt url author { login }'
+
+REPO_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) { id }
+}
+"""
+
+ISSUES_QUERY = f"""
+query($owner: String!, $name: String!, $cursor: String, $since: DateTime, $comments: Int!, $withComments: Boolean!) {{
+  repository(owner: $owner, name: $name) {{
+    issues(first: 100, after: $cursor, orderBy: {{field: UPDATED_AT, direction: ASC}}, filterBy: {{since: $since}}) {{
+      {PAGE_INFO}
+      nodes {{
+        number title body state url updatedAt
+        labels(first: 100) {{ nodes {{ name }} }}
+        milestone {{ number title }}
+        comments(first: $comments) @include(if: $withComments) {{
+          {PAGE_INFO}
+          nodes {{ {COMMENT_FIELDS} }}
+        }}
+      }}
+    }}
+  }}
+}}
+"""
+
+ISSUE_COMMENTS_QUERY = f"""
+query($owner: String!, $name: String!, $number: Int!, $cursor: String) {{
+  repository(owner: $owner, name: $name) {{
+    issue(number: $number) {{
+      comments(first: 100, after: $cursor) {{
+        {PAGE_INFO}
+        nodes {{ {COMMENT_FIELDS} }}
+      }}
+    }}
+  }}
+}}
+"""
+
+LABELS_QUERY = f"""
+query($owner: String!, $name: String!, $cursor: String) {{
+  repository(owner: $owner, name: $name) {{
+    labels(first: 100, after: $cursor) {{
+      {PAGE_INFO}
+      nodes {{ name color description }}
+    }}
+  }}
+}}
+"""
+
+MILESTONES_QUERY = f"""
+query($owner: String!, $name: String!, $cursor: String) {{
+  repository(owner: $owner, name: $name) {{
+    milestones(first: 100, after: $cursor, states: [OPEN, CLOSED]) {{
+      {PAGE_INFO}
+      nodes {{ number title description state dueOn }}
+    }}
+  }}
+}}
+"""
+
+
+class GraphQLError(Exception):
+    """The query went through but GitHub sent back errors instead of (all the) data"""
+
+
+def graphql_url(api_base):
+    """https://api.github.com -> .../graphql, GHE's https://host/api/v3 -> https://host/api/graphql"""
+    api_base = api_base.rstrip('/')
+    if api_base.endswith('/v3'):
+        api_base = api_base[:-len('/v3')]
+    return f"{api_base}/graphql"
+
+
+class GitHubGraphQL:
+    """Reads one repo's issues, comments, labels and milestones over GraphQL"""
+    
+    def __init__(self, headers, api_base, repo):
+        # Own client without the write spacing - these are POSTs, but they're only reads
+        self.client = ApiClient(headers)
+        self.url = graphql_url(api_base)
+        self.api_base = api_base
+        self.repo = repo
+        self.owner, self.name = repo.split('/', 1)
+        self._available = None
+    
+    def query(self, query, **variables):
+        """Run a query, returns its data"""
+        resp = self.client.post(self.url, json={'query': query, 'variables': variables}, retry_post=True)
+        if resp.status_code != 200:
+            raise ApiError(resp)
+        body = resp.json()
+        if body.get('errors'):
+            raise GraphQLError('; '.join(e.get('message', str(e)) for e in body['errors']))
+        return body['data']
+    
+    def available(self):
+        """Whether GraphQL works here - checked once, prints why not if it doesn't"""
+        if self._available is None:
+            try:
+                self._available = bool(self.query(REPO_QUERY, owner=self.owner, name=self.name)['repository'])
+            except (ApiError, GraphQLError, requests.RequestException, ValueError, KeyError, TypeError) as e:
+                print(f"  ⚠️  GraphQL not available ({e}), using REST")
+                self._available = False
+        return self._available
+    
+    def _pages(self, query, path, **variables):
+        """Every node of a connection, following the cursors.
+        
+        path is the keys from data down to the connection. Same deal as
+        ApiClient.paginate - the next page is on its way while you go
+        through the current one.
+        """
+        def fetch(cursor):
+            connection = self.query(query, cursor=cursor, **variables)
+            for key in path:
+                connection = connection[key]
+            return connection
+        
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = pool.submit(contextvars.copy_context().run, fetch, None)
+            while pending is not None:
+                connection = pending.result()
+                info = connection['pageInfo']
+                pending = None
+                if info['hasNextPage']:
+                    pending = pool.submit(contextvars.copy_context().run, fetch, info['endCursor'])
+                yield from connection['nodes']
+    
+    def _comment(self, number, node):
+        """A comment node as the REST API would give it"""
+        return {
+            'id': node['databaseId'],
+            'body': node['body'],
+            'user': {'login': (node.get('author') or {}).get('login', 'ghost')},
+            'updated_at': node['updatedAt'],
+            'html_url': node['url'],
+            'issue_url': f"{self.api_base}/repos/{self.repo}/issues/{number}",
+        }
+    
+    def issues(self, since=None, comments=0):
+        """Issues (no PRs) updated since `since`, oldest change first, shaped like REST ones.
+        
+        With comments > 0 each one also has 'comment_list' with all its comments
+        (the first `comments` come with the issue, the rest get fetched after).
+        """
+        nodes = self._pages(ISSUES_QUERY, ('repository', 'issues'), owner=self.owner, name=self.name,
+                            since=since, comments=max(1, comments), withComments=comments > 0)
+        for node in nodes:
+            number = node['number']
+            issue = {
+                'number': number,
+                'title': node['title'],
+                'body': node['body'],
+                'state': node['state'].lower(),
+                'html_url': node['url'],
+                'updated_at': node['updatedAt'],
+                'labels': [{'name': label['name']} for label in node['labels']['nodes']],
+                'milestone': node['milestone'],
+            }
+            if comments > 0:
+                connection = node['comments']
+                issue['comment_list'] = [self._comment(number, c) for c in connection['nodes']]
+                if connection['pageInfo']['hasNextPage']:
+                    # Busy issue - get the rest, starting where the nested ones stopped
+                    issue['comment_list'] += [self._comment(number, c) for c in
+                                              self._issue_comments(number, connection['pageInfo']['endCursor'])]
+            yield issue
+    
+    def _issue_comments(self, number, cursor):
+        # First page comes from the cursor we already have, not from the start
+        while True:
+            connection = self.query(ISSUE_COMMENTS_QUERY, owner=self.owner, name=self.name, number=number,
+                                    cursor=cursor)['repository']['issue']['comments']
+            yield from connection['nodes']
+            if not connection['pageInfo']['hasNextPage']:
+                return
+            cursor = connection['pageInfo']['endCursor']
+    
+    def comments(self, since=None):
+        """Comments on issues (not PRs) updated since `since`, in order within each issue"""
+        for issue in self.issues(since, comments=GITHUB_GRAPHQL_COMMENTS):
+            for comment in issue['comment_list']:
+                if since and comment['updated_at'] < since:
+                    continue
+                yield comment
+    
+    def labels(self):
+        for node in self._pages(LABELS_QUERY, ('repository', 'labels'), owner=self.owner, name=self.name):
+            yield {'name': node['name'], 'color': node['color'], 'description': node['description']}
+    
+    def milestones(self):
+        """Open and closed milestones"""
+        for node in self._pages(MILESTONES_QUERY, ('repository', 'milestones'), owner=self.owner, name=self.name):
+            yield {
+                'number': node['number'],
+                'title': node['title'],
+                'description': node['description'],
+                'state': node['state'].lower(),
+                'due_on': node['dueOn'],
+            }
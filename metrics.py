@@ -0,0 +1,188 @@
+# Numbers for a sync run: how long each phase took, how many API calls went
+# out (and what came back), bytes moved, and how much rate limit was left.
+# Written out at the end of a run as JSON lines and/or a Prometheus textfile.
+
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+# Append one JSON object per phase (plus a summary) to this file
+SYNC_METRICS_JSON = os.getenv('SYNC_METRICS_JSON')
+# Prometheus textfile (e.g. for node_exporter's textfile collector) - rewritten every time
+SYNC_METRICS_PROM = os.getenv('SYNC_METRICS_PROM')
+# Where --profile puts the cProfile dump (look at it with `python -m pstats` or snakeviz)
+SYNC_PROFILE = os.getenv('SYNC_PROFILE', 'sync.prof')
+
+
+def endpoint(url):
+    """URL path with the ids taken out, so calls to the same endpoint get counted together.
+    
+    /repos/me/proj/issues/12/comments -> /repos/:repo/issues/:id/comments
+    /api/v4/projects/42/issues/3/notes -> /api/v4/projects/:id/issues/:id/notes
+    """
+    path = urlparse(url).path
+    path = re.sub(r'/repos/[^/]+/[^/]+', '/repos/:repo', path)
+    path = re.sub(r'/projects/[^/]+', '/projects/:id', path)
+    return re.sub(r'/\d+(?=/|$)', '/:id', path)
+
+
+class Metrics:
+    """Counters, gauges and timed spans, safe to use from any thread.
+    
+    Counters only go up (Prometheus style). Spans all add up into
+    <name>_seconds sum/count/max, and the phase-level ones (item=False) are
+    also kept individually for the JSON lines output.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value
+        self.gauges = {}
+        self.spans = []     # finished phase spans not written out yet
+        self.started = time.time()
+    
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+    
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+    
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+    
+    @contextlib.contextmanager
+    def span(self, name, item=False, **labels):
+        """Time a block. item=True for per-ref/per-issue spans - those only go into the totals."""
+        start = time.time()
+        began = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            seconds = time.perf_counter() - began
+            key = self._key(f"span_{name}", labels)
+            with self.lock:
+                sum_key = (f"{key[0]}_seconds_sum", key[1])
+                count_key = (f"{key[0]}_seconds_count", key[1])
+                max_key = (f"{key[0]}_seconds_max", key[1])
+                self.counters[sum_key] = self.counters.get(sum_key, 0) + seconds
+                self.counters[count_key] = self.counters.get(count_key, 0) + 1
+                self.gauges[max_key] = max(self.gauges.get(max_key, 0), seconds)
+                if not item:
+                    self.spans.append({
+                        'type': 'span', 'name': name, 'labels': dict(key[1]), 'ok': ok,
+                        'start': datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                        'seconds': round(seconds, 4),
+                    })
+    
+    def timed(self, name, fn, **labels):
+        """Wrap a per-item function (like an issue create) in an item span, counting its True/False in items_total"""
+        def wrapper(*args, **kwargs):
+            with self.span(name, item=True, **labels):
+                ok = fn(*args, **kwargs)
+            self.inc('items_total', kind=name, result='ok' if ok else 'failed', **labels)
+            return ok
+        return wrapper
+    
+    def phase(self, name):
+        """Decorator version of span() for a whole method"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+    
+    def write_json(self, path):
+        """Append the spans since the last write, then one summary line with every counter/gauge"""
+        with self.lock:
+            spans, self.spans = self.spans, []
+            summary = {
+                'type': 'summary',
+                'time': datetime.now(timezone.utc).isoformat(),
+                'uptime_seconds': round(time.time() - self.started, 3),
+                'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in sorted(self.counters.items())],
+                'gauges': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in sorted(self.gauges.items())],
+            }
+        with open(path, 'a') as f:
+            for line in spans + [summary]:
+                f.write(json.dumps(line) + '\n')
+    
+    def prometheus(self):
+        """Everything in Prometheus text format"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+        lines = []
+        typed = set()
+        for kind, items in (('counter', counters), ('gauge', gauges)):
+            for (name, labels), value in items:
+                metric = f"sync_{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} {kind}")
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                value = _number(value)
+                lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path):
+        # Write then rename, so the collector never reads half a file
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.prometheus())
+        os.replace(path + '.tmp', path)
+    
+    def export(self):
+        """Write out to wherever SYNC_METRICS_JSON / SYNC_METRICS_PROM point (if anywhere)"""
+        try:
+            if SYNC_METRICS_JSON:
+                self.write_json(SYNC_METRICS_JSON)
+            if SYNC_METRICS_PROM:
+                self.write_prometheus(SYNC_METRICS_PROM)
+        except OSError as e:
+            print(f"⚠️  Couldn't write metrics: {e}")
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    # Full precision - :g rounds to 6 digits, so big counters would move in jumps
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+# One for the whole process, like the rate limiter
+metrics = Metrics()
+
+
+def run(main):
+    """Run a script's main(), with --profile for a cProfile dump, and export metrics at the end"""
+    profiler = cProfile.Profile() if '--profile' in sys.argv else None
+    try:
+        if profiler:
+            profiler.runcall(main)
+        else:
+            main()
+    finally:
+        metrics.gauge('run_seconds', time.time() - metrics.started)
+        metrics.export()
+        if profiler:
+            profiler.dump_stats(SYNC_PROFILE)
+            print(f"📈 Profile written to {SYNC_PROFILE}")
@@ -0,0 +1,106 @@
+# Small asyncio pipeline for the issue/comment syncs
+# One producer streams source items (the paginated listing), a bounded set of
+# writers does the POSTs. The HTTP layer (api_client.py) is plain requests, so
+# the actual calls run in worker threads - asyncio just does the scheduling.
+
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# How many writes to have in flight at once per target
+SYNC_WRITE_WORKERS = int(os.getenv('SYNC_WRITE_WORKERS', '8'))
+
+_DONE = object()
+
+
+class _LineOutput:
+    """stdout wrapper that only ever writes whole lines, so the writers' prints don't get mixed up"""
+    
+    line_safe = True
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+    
+    def write(self, text):
+        buffered = getattr(self.local, 'buffer', '') + text
+        *lines, self.local.buffer = buffered.split('\n')
+        if lines:
+            with self.lock:
+                self.stream.write(''.join(f"{line}\n" for line in lines))
+        return len(text)
+    
+    def flush(self):
+        self.stream.flush()
+
+
+def run_pipeline(jobs, work, workers=None, key=None):
+    """Call work(job) for every job, up to `workers` at a time. Returns the results.
+    
+    jobs can be any (blocking) iterator, it's pulled lazily so the source listing
+    and the writes overlap and only a couple of jobs per worker are ever queued.
+    If key is given, jobs with the same key(job) run one after another in the
+    order they came in (e.g. comments on the same issue) - different keys still
+    run in parallel. An exception in work() counts as a False result; one from
+    the jobs iterator stops everything and gets raised.
+    """
+    workers = max(1, workers or SYNC_WRITE_WORKERS)
+    # Batch mode already swaps in a line-safe stdout, only wrap it when nobody else has
+    if getattr(sys.stdout, 'line_safe', False):
+        return asyncio.run(_run(jobs, work, workers, key))
+    real_stdout = sys.stdout
+    sys.stdout = _LineOutput(real_stdout)
+    try:
+        return asyncio.run(_run(jobs, work, workers, key))
+    finally:
+        sys.stdout = real_stdout
+
+
+async def _run(jobs, work, workers, key):
+    loop = asyncio.get_running_loop()
+    # One extra thread for the producer so it never waits behind the writers
+    executor = ThreadPoolExecutor(max_workers=workers + 1)
+    # With a key each worker gets its own queue, so one key always lands on the same worker
+    queues = [asyncio.Queue(maxsize=2) for _ in range(workers)] if key else [asyncio.Queue(maxsize=workers * 2)]
+    results = []
+    
+    def in_thread(fn, *args):
+        # copy_context so thread-local-ish stuff (like the batch mode output prefix) follows along
+        return loop.run_in_executor(executor, contextvars.copy_context().run, fn, *args)
+    
+    async def producer():
+        it = iter(jobs)
+        try:
+            while True:
+                job = await in_thread(next, it, _DONE)
+                if job is _DONE:
+                    break
+                queue = queues[hash(key(job)) % len(queues)] if key else queues[0]
+                await queue.put(job)
+        finally:
+            # Always tell the workers to stop, even if the listing blew up
+            for queue in queues:
+                for _ in range(1 if key else workers):
+                    await queue.put(_DONE)
+    
+    async def worker(queue):
+        while True:
+            job = await queue.get()
+            if job is _DONE:
+                return
+            try:
+                results.append(await in_thread(work, job))
+            except Exception as e:
+                print(f"  ❌ Error: {e}")
+                results.append(False)
+    
+    consumers = [worker(q) for q in queues] if key else [worker(queues[0]) for _ in range(workers)]
+    try:
+        await asyncio.gather(producer(), *consumers)
+    finally:
+        executor.shutdown(wait=True)
+    return results
@@ -4,9 +4,14 @@
 
 import os
 import sys
-import requests
 from datetime import datetime
 
+from api_client import ApiClient, ApiError, GITHUB_WRITE_INTERVAL
+from github_graphql import GitHubGraphQL, GITHUB_GRAPHQL
+from metrics import metrics, run as run_with_metrics
+from pipeline import run_pipeline
+from sync_state import SyncState, content_hash, pair_key
+
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 GITLAB_TOKEN = os.getenv('GITLAB_TOKEN')
 GITHUB_REPO = os.getenv('GITHUB_REPO')
@@ -16,21 +21,44 @@ GITLAB_API_BASE = os.getenv('GITLAB_API_BASE', 'https://gitlab.com/api/v4')
 
 
 class ActivitySyncer:
-    def __init__(self):
-        if GITHUB_TOKEN:
+    def __init__(self, github_repo=None, gitlab_repo=None, github_token=None, gitlab_token=None,
+                 github_api_base=None, gitlab_api_base=None, state=None, graphql=None):
+        # Same deal as RepoSyncer - anything not passed in comes from the env vars
+        self.github_repo = github_repo or GITHUB_REPO
+        self.gitlab_repo = gitlab_repo or GITLAB_REPO
+        self.github_api_base = github_api_base or GITHUB_API_BASE
+        self.gitlab_api_base = gitlab_api_base or GITLAB_API_BASE
+        github_token = github_token or GITHUB_TOKEN
+        gitlab_token = gitlab_token or GITLAB_TOKEN
+        
+        if github_token:
             self.github_headers = {
-                'Authorization': f'token {GITHUB_TOKEN}',
+                'Authorization': f'token {github_token}',
                 'Accept': 'application/vnd.github.v3+json'
             }
         else:
             self.github_headers = {}
         
-        if GITLAB_TOKEN:
-            self.gitlab_headers = {'PRIVATE-TOKEN': GITLAB_TOKEN}
+        if gitlab_token:
+            self.gitlab_headers = {'PRIVATE-TOKEN': gitlab_token}
         else:
             self.gitlab_headers = {}
         
+        # Pooled sessions with timeouts, retries and rate limit pacing (see api_client.py)
+        # GitHub gets its writes spaced out so we don't trip the secondary rate limit
+        self.github = ApiClient(self.github_headers, write_interval=GITHUB_WRITE_INTERVAL)
+        self.gitlab = ApiClient(self.gitlab_headers)
+        # Bulk reads over GraphQL instead of REST, if turned on (see github_graphql.py)
+        use_graphql = GITHUB_GRAPHQL if graphql is None else graphql
+        self.graphql = None
+        if use_graphql and github_token and self.github_repo:
+            self.graphql = GitHubGraphQL(self.github_headers, self.github_api_base, self.github_repo)
+        
         self.gitlab_project_id = None
+        
+        # Remembers what we already created (see sync_state.py)
+        self.state = state or SyncState()
+        self.pair = pair_key(self.github_repo, self.gitlab_repo)
     
     def get_gitlab_project_id(self):
         """Get the GitLab project ID"""
@@ -38,8 +66,8 @@ class ActivitySyncer:
             return self.gitlab_project_id
         
         try:
-            url = f"{GITLAB_API_BASE}/projects/{GITLAB_REPO.replace('/', '%2F')}"
-            response = requests.get(url, headers=self.gitlab_headers)
+            url = f"{self.gitlab_api_base}/projects/{self.gitlab_repo.replace('/', '%2F')}"
+            response = self.gitlab.get(url)
             if response.status_code == 200:
                 self.gitlab_project_id = str(response.json()['id'])
                 return self.gitlab_project_id
@@ -47,8 +75,9 @@ class ActivitySyncer:
             print(f"Error getting project ID: {e}")
         return None
     
+    @metrics.phase('milestones')
     def sync_milestones(self):
-        """Copy milestones from GitHub to GitLab"""
+        """Copy milestones from GitHub to GitLab (and edits to ones we copied before)"""
         print("📌 Syncing milestones...")
         
         gitlab_project_id = self.get_gitlab_project_id()
@@ -57,43 +86,94 @@ class ActivitySyncer:
             return
         
         try:
-            url = f"{GITHUB_API_BASE}/repos/{GITHUB_REPO}/milestones"
-            response = requests.get(url, headers=self.github_headers, params={'state': 'all'})
-            if response.status_code != 200:
-                print(f"Failed to get milestones: {response.status_code}")
-                return
-            milestones = response.json()
-            
-            gitlab_url = f"{GITLAB_API_BASE}/projects/{gitlab_project_id}/milestones"
-            
-            for milestone in milestones:
-                # Check if it already exists
-                existing = requests.get(gitlab_url, headers=self.gitlab_headers,
-                                      params={'search': milestone['title']})
-                if existing.json():
-                    continue
-                
-                # Create it
-                due_date = None
-                if milestone.get('due_on'):
-                    due_date = milestone['due_on'][:10]  # Just the date part
-                
+            url = f"{self.github_api_base}/repos/{self.github_repo}/milestones"
+            if self.graphql and self.graphql.available():
+                milestones = self.graphql.milestones()
+            else:
+                milestones = self.github.paginate(url, params={'state': 'all'})
+            
+            gitlab_url = f"{self.gitlab_api_base}/projects/{gitlab_project_id}/milestones"
+            copied = self.state.load(self.pair, 'milestone', 'github')
+            hashes = self.state.load_hashes(self.pair, 'milestone', 'github')
+            existing = None
+            
+            def to_sync():
+                nonlocal existing
+                for milestone in milestones:
+                    number = str(milestone['number'])
+                    if number in copied:
+                        if self._changed('milestone', number, _milestone_content(milestone), hashes):
+                            yield 'update', milestone
+                        continue
+                    
+                    # Not in the db - fetch what GitLab already has (once) instead of searching per milestone
+                    if existing is None:
+                        existing = {m['title']: m['id'] for m in self.gitlab.paginate(gitlab_url)}
+                    
+                    # Check if it already exists
+                    if milestone['title'] in existing:
+                        self.state.put(self.pair, 'milestone', 'github', milestone['number'],
+                                       existing[milestone['title']])
+                        continue
+                    existing[milestone['title']] = None  # queued, don't create it twice
+                    yield 'create', milestone
+            
+            def create(milestone):
+                content = _milestone_content(milestone)
                 data = {
-                    'title': milestone['title'],
-                    'description': milestone.get('description', ''),
-                    'due_date': due_date
+                    'title': content['title'],
+                    'description': content['description'],
+                    'due_date': content['due_date']
                 }
                 
-                resp = requests.post(gitlab_url, headers=self.gitlab_headers, json=data)
+                self.state.begin(self.pair, 'milestone', 'github', milestone['number'])
+                resp = self.gitlab.post(gitlab_url, json=data)
                 if resp.status_code == 201:
+                    milestone_id = resp.json()['id']
+                    # They always start out active
+                    if content['state'] == 'closed':
+                        closed = self.gitlab.put(f"{gitlab_url}/{milestone_id}", json={'state_event': 'close'})
+                        if closed.status_code != 200:
+                            content['state'] = 'open'  # so the next run tries again
+                    self.state.put(self.pair, 'milestone', 'github', milestone['number'], milestone_id,
+                                   content_hash(content))
                     print(f"  ✅ Synced milestone: {milestone['title']}")
-                else:
-                    print(f"  ⚠️  Failed: {milestone['title']}")
+                    return True
+                self.state.fail(self.pair, 'milestone', 'github', milestone['number'])
+                print(f"  ⚠️  Failed: {milestone['title']}")
+                return False
+            
+            def update(milestone):
+                number = str(milestone['number'])
+                content = _milestone_content(milestone)
+                data = {
+                    'title': content['title'],
+                    'description': content['description'],
+                    'due_date': content['due_date'],
+                    'state_event': 'close' if content['state'] == 'closed' else 'activate'
+                }
+                
+                resp = self.gitlab.put(f"{gitlab_url}/{copied[number]}", json=data)
+                if resp.status_code == 200:
+                    self.state.set_hash(self.pair, 'milestone', 'github', number, content_hash(content))
+                    print(f"  ✏️  Updated milestone: {milestone['title']}")
+                    return True
+                print(f"  ⚠️  Failed to update: {milestone['title']}")
+                return False
+            
+            write = {
+                'create': metrics.timed('milestone_create', create),
+                'update': metrics.timed('milestone_update', update),
+            }
+            run_pipeline(to_sync(), lambda job: write[job[0]](job[1]))
+        except ApiError as e:
+            print(f"Failed to list milestones: {e}")
         except Exception as e:
             print(f"  ❌ Error: {e}")
     
+    @metrics.phase('labels')
     def sync_labels(self):
-        """Copy labels from GitHub to GitLab"""
+        """Copy labels from GitHub to GitLab (and color/description changes to ones we copied before)"""
         print("🏷️  Syncing labels...")
         
         gitlab_project_id = self.get_gitlab_project_id()
@@ -101,79 +181,308 @@ class ActivitySyncer:
             return
         
         try:
-            url = f"{GITHUB_API_BASE}/repos/{GITHUB_REPO}/labels"
-            response = requests.get(url, headers=self.github_headers)
-            if response.status_code != 200:
-                print(f"Failed to get labels: {response.status_code}")
-                return
-            labels = response.json()
-            
-            gitlab_url = f"{GITLAB_API_BASE}/projects/{gitlab_project_id}/labels"
-            
-            for label in labels:
-                # Check if label already exists
-                existing = requests.get(gitlab_url, headers=self.gitlab_headers,
-                                      params={'search': label['name']})
-                existing_labels = existing.json()
-                if any(l['name'] == label['name'] for l in existing_labels):
-                    continue
-                
-                # Create it
-                color = label['color'].lstrip('#')  # GitLab doesn't want the #
+            url = f"{self.github_api_base}/repos/{self.github_repo}/labels"
+            if self.graphql and self.graphql.available():
+                labels = self.graphql.labels()
+            else:
+                labels = self.github.paginate(url)
+            
+            gitlab_url = f"{self.gitlab_api_base}/projects/{gitlab_project_id}/labels"
+            copied = self.state.load(self.pair, 'label', 'github')
+            hashes = self.state.load_hashes(self.pair, 'label', 'github')
+            existing = None
+            
+            def to_sync():
+                nonlocal existing
+                for label in labels:
+                    if label['name'] in copied:
+                        if self._changed('label', label['name'], _label_content(label), hashes):
+                            yield 'update', label
+                        continue
+                    
+                    # Same deal - one listing up front, then dict lookups
+                    if existing is None:
+                        existing = {l['name']: l['id'] for l in self.gitlab.paginate(gitlab_url)}
+                    
+                    # Check if label already exists
+                    if label['name'] in existing:
+                        self.state.put(self.pair, 'label', 'github', label['name'], existing[label['name']])
+                        continue
+                    existing[label['name']] = None
+                    yield 'create', label
+            
+            def create(label):
+                content = _label_content(label)
                 data = {
-                    'name': label['name'],
-                    'color': color,
-                    'description': label.get('description', '')
+                    'name': content['name'],
+                    'color': content['color'],
+                    'description': content['description']
                 }
                 
-                resp = requests.post(gitlab_url, headers=self.gitlab_headers, json=data)
+                self.state.begin(self.pair, 'label', 'github', label['name'])
+                resp = self.gitlab.post(gitlab_url, json=data)
                 if resp.status_code == 201:
+                    self.state.put(self.pair, 'label', 'github', label['name'], resp.json()['id'],
+                                   content_hash(content))
                     print(f"  ✅ Synced label: {label['name']}")
-                else:
-                    print(f"  ⚠️  Failed: {label['name']}")
+                    return True
+                self.state.fail(self.pair, 'label', 'github', label['name'])
+                print(f"  ⚠️  Failed: {label['name']}")
+                return False
+            
+            def update(label):
+                content = _label_content(label)
+                data = {
+                    'color': content['color'],
+                    'description': content['description']
+                }
+                
+                resp = self.gitlab.put(f"{gitlab_url}/{copied[label['name']]}", json=data)
+                if resp.status_code == 200:
+                    self.state.set_hash(self.pair, 'label', 'github', label['name'], content_hash(content))
+                    print(f"  ✏️  Updated label: {label['name']}")
+                    return True
+                print(f"  ⚠️  Failed to update: {label['name']}")
+                return False
+            
+            write = {
+                'create': metrics.timed('label_create', create),
+                'update': metrics.timed('label_update', update),
+            }
+            run_pipeline(to_sync(), lambda job: write[job[0]](job[1]))
+        except ApiError as e:
+            print(f"Failed to list labels: {e}")
         except Exception as e:
             print(f"  ❌ Error: {e}")
     
-    def sync_comments(self, issue_number):
-        """Copy comments for a specific issue"""
+    @metrics.phase('comments')
+    def sync_comments(self, issue_number, full=False):
+        """Copy comments for a specific issue (just new/edited ones unless full=True)"""
         print(f"💬 Syncing comments for issue #{issue_number}...")
         
         gitlab_project_id = self.get_gitlab_project_id()
         if not gitlab_project_id:
             return
         
+        mark_name = f"comments:{issue_number}:github-to-gitlab"
+        since = None if full else self.state.get_watermark(self.pair, mark_name)
+        newest = since
+        
         try:
             # Get comments from GitHub
-            url = f"{GITHUB_API_BASE}/repos/{GITHUB_REPO}/issues/{issue_number}/comments"
-            response = requests.get(url, headers=self.github_headers)
-            if response.status_code != 200:
-                print(f"Failed to get comments: {response.status_code}")
-                return
-            comments = response.json()
-            
-            # Find the matching GitLab issue
-            gitlab_issues_url = f"{GITLAB_API_BASE}/projects/{gitlab_project_id}/issues"
-            gitlab_issues = requests.get(gitlab_issues_url, headers=self.gitlab_headers,
-                                       params={'search': f'#{issue_number}'})
-            
-            if not gitlab_issues.json():
-                print("Couldn't find matching GitLab issue")
-                return
-            
-            gitlab_issue_iid = gitlab_issues.json()[0]['iid']
-            gitlab_comments_url = f"{GITLAB_API_BASE}/projects/{gitlab_project_id}/issues/{gitlab_issue_iid}/notes"
-            
-            for comment in comments:
-                data = {
-                    'body': f"**{comment['user']['login']}** (from GitHub):\n\n{comment['body']}"
-                }
-                resp = requests.post(gitlab_comments_url, headers=self.gitlab_headers, json=data)
-                if resp.status_code == 201:
-                    print(f"  ✅ Synced comment from {comment['user']['login']}")
+            url = f"{self.github_api_base}/repos/{self.github_repo}/issues/{issue_number}/comments"
+            comments = self.github.paginate(url, params={'since': since} if since else None)
+            
+            # Find the matching GitLab issue - the db knows if we synced it
+            gitlab_issue_iid = (self.state.get(self.pair, 'issue', 'github', issue_number) or
+                                self.state.reverse(self.pair, 'issue', 'gitlab', issue_number))
+            if not gitlab_issue_iid:
+                # Synced before the db existed? Only trust the "Synced from" footer, a
+                # text search can turn up any issue that happens to mention #N
+                issue = self.github.get(f"{self.github_api_base}/repos/{self.github_repo}/issues/{issue_number}")
+                if issue.status_code != 200:
+                    raise ApiError(issue)
+                issue = issue.json()
+                gitlab_issues_url = f"{self.gitlab_api_base}/projects/{gitlab_project_id}/issues"
+                if 'pull_request' in issue:
+                    gitlab_issue_iid = None  # PRs don't get a GitLab issue
                 else:
-                    print(f"  ⚠️  Failed to sync comment")
+                    gitlab_issue_iid = self._index_synced_issues(gitlab_issues_url).get(issue['html_url'])
+                
+                if not gitlab_issue_iid:
+                    print("Couldn't find matching GitLab issue")
+                    return
+                self.state.put(self.pair, 'issue', 'github', issue_number, gitlab_issue_iid)
+            gitlab_comments_url = f"{self.gitlab_api_base}/projects/{gitlab_project_id}/issues/{gitlab_issue_iid}/notes"
+            copied = self.state.load(self.pair, 'comment', 'github')
+            pending = self.state.pending(self.pair, 'comment', 'github')
+            notes = {}
+            
+            def to_post():
+                nonlocal newest
+                for comment in comments:
+                    newest = max(newest or '', comment.get('updated_at') or '') or None
+                    
+                    # Already posted this one on an earlier run
+                    if str(comment['id']) in copied:
+                        continue
+                    if str(comment['id']) in pending and self._already_posted(gitlab_comments_url, comment, notes):
+                        continue
+                    yield comment
+            
+            def post(comment):
+                return self._post_comment(gitlab_comments_url, comment)
+            
+            # Keyed on the issue so the comments still land in order - the listing
+            # just overlaps with the posting
+            results = run_pipeline(to_post(), metrics.timed('comment_post', post), key=lambda comment: issue_number)
+            
+            if all(results) and newest:
+                self.state.set_watermark(self.pair, mark_name, newest)
+        except ApiError as e:
+            print(f"Failed to get comments: {e}")
+        except Exception as e:
+            print(f"  ❌ Error: {e}")
+    
+    @metrics.phase('comments')
+    def sync_all_comments(self, full=False):
+        """Copy new comments for every issue in one go (just new/edited ones unless full=True)
+        
+        Uses the repo-wide comments listing instead of one call per issue, then
+        sends each comment to the GitLab issue it belongs to.
+        """
+        print("💬 Syncing comments for all issues...")
+        
+        gitlab_project_id = self.get_gitlab_project_id()
+        if not gitlab_project_id:
+            return
+        
+        mark_name = 'comments:github-to-gitlab'
+        since = None if full else self.state.get_watermark(self.pair, mark_name)
+        newest = since
+        held = None  # oldest skipped issue comment, the mark can't go past it
+        skipped = 0
+        
+        try:
+            # Oldest first so comments on the same issue go over in the order they were written
+            url = f"{self.github_api_base}/repos/{self.github_repo}/issues/comments"
+            params = {'sort': 'created', 'direction': 'asc'}
+            if since:
+                params['since'] = since
+                print(f"  Only comments updated since {since}")
+            if self.graphql and self.graphql.available():
+                # Comes with each issue's comments in one go, so no PR comments to skip either
+                comments = self.graphql.comments(since)
+            else:
+                comments = self.github.paginate(url, params=params)
+            
+            gitlab_issues_url = f"{self.gitlab_api_base}/projects/{gitlab_project_id}/issues"
+            issues = self.state.load(self.pair, 'issue', 'github')
+            # GitHub issues that are copies of GitLab ones - their comments go to the original
+            issues.update({number: iid for iid, number in self.state.load(self.pair, 'issue', 'gitlab').items()})
+            copied = self.state.load(self.pair, 'comment', 'github')
+            pending = self.state.pending(self.pair, 'comment', 'github')
+            if pending:
+                print(f"  Resuming: {len(pending)} comment posts were interrupted last time, checking them first")
+            notes = {}
+            synced = None  # GitLab issues by the GitHub URL they came from, listed only if needed
+            
+            def to_post():
+                nonlocal newest, held, synced, skipped
+                for comment in comments:
+                    newest = max(newest or '', comment.get('updated_at') or '') or None
+                    if str(comment['id']) in copied:
+                        continue
+                    
+                    # .../issues/<number> - PR comments come through here too
+                    number = comment['issue_url'].rstrip('/').rsplit('/', 1)[1]
+                    if number not in issues:
+                        issue_url = comment.get('html_url', '').split('#', 1)[0]
+                        if '/pull/' in issue_url:
+                            skipped += 1  # PRs never get an issue on GitLab, no need to come back for these
+                            continue
+                        # Issue synced before the db existed? Look for the footer on the GitLab side (once)
+                        if synced is None:
+                            synced = self._index_synced_issues(gitlab_issues_url)
+                        if issue_url not in synced:
+                            # Issue isn't on GitLab yet - pick this one up again once it is
+                            skipped += 1
+                            held = min(held or comment['updated_at'], comment['updated_at'])
+                            continue
+                        issues[number] = synced[issue_url]
+                        self.state.put(self.pair, 'issue', 'github', number, issues[number])
+                    notes_url = f"{gitlab_issues_url}/{issues[number]}/notes"
+                    if str(comment['id']) in pending and self._already_posted(notes_url, comment, notes):
+                        continue
+                    yield number, comment
+            
+            def post(job):
+                number, comment = job
+                return self._post_comment(f"{gitlab_issues_url}/{issues[number]}/notes", comment)
+            
+            # Same issue -> same worker, in order; different issues go in parallel
+            results = run_pipeline(to_post(), metrics.timed('comment_post', post), key=lambda job: job[0])
+            
+            if skipped:
+                print(f"  Skipped {skipped} comments on PRs / issues that aren't on GitLab yet")
+            # Stop at the oldest comment we couldn't place (since is inclusive, so it comes
+            # back next run) - already copied ones in between are skipped by id
+            if held and newest:
+                newest = min(newest, held)
+            if all(results) and newest:
+                self.state.set_watermark(self.pair, mark_name, newest)
+        except ApiError as e:
+            print(f"Failed to get comments: {e}")
         except Exception as e:
             print(f"  ❌ Error: {e}")
+    
+    def _changed(self, kind, source_id, content, hashes):
+        """Whether something we copied before needs writing again, going by its content hash"""
+        digest = content_hash(content)
+        stored = hashes.get(source_id)
+        if stored is None:
+            # Copied before we kept hashes - assume it's current, just remember the hash
+            self.state.set_hash(self.pair, kind, 'github', source_id, digest)
+            return False
+        return stored != digest
+    
+    def _index_synced_issues(self, gitlab_issues_url):
+        """GitLab issue iids keyed by the GitHub URL in their "Synced from GitHub" footer"""
+        marker = "*Synced from GitHub: "
+        index = {}
+        for issue in self.gitlab.paginate(gitlab_issues_url, params={'state': 'all'}):
+            body = issue.get('description') or ''
+            if marker in body:
+                index[body.rsplit(marker, 1)[1].strip().rstrip('*')] = str(issue['iid'])
+        return index
+    
+    def _already_posted(self, gitlab_comments_url, comment, notes):
+        """Check whether an interrupted post actually made it, and record it if so.
+        
+        notes caches each issue's note bodies so an issue only gets listed once.
+        """
+        if gitlab_comments_url not in notes:
+            notes[gitlab_comments_url] = {n['body']: n['id'] for n in self.gitlab.paginate(gitlab_comments_url)}
+        note_id = notes[gitlab_comments_url].get(_comment_body(comment))
+        if note_id is None:
+            return False
+        self.state.put(self.pair, 'comment', 'github', comment['id'], note_id)
+        return True
+    
+    def _post_comment(self, gitlab_comments_url, comment):
+        """Post one GitHub comment as a GitLab note and remember it"""
+        data = {'body': _comment_body(comment)}
+        self.state.begin(self.pair, 'comment', 'github', comment['id'])
+        resp = self.gitlab.post(gitlab_comments_url, json=data)
+        if resp.status_code == 201:
+            self.state.put(self.pair, 'comment', 'github', comment['id'], resp.json()['id'])
+            print(f"  ✅ Synced comment from {comment['user']['login']}")
+            return True
+        self.state.fail(self.pair, 'comment', 'github', comment['id'])
+        print(f"  ⚠️  Failed to sync comment")
+        return False
+
+
+def _milestone_content(milestone):
+    """The parts of a GitHub milestone we copy (also what content_hash() looks at)"""
+    return {
+        'title': milestone['title'],
+        'description': milestone.get('description') or '',
+        'state': 'closed' if milestone.get('state') == 'closed' else 'open',
+        'due_date': milestone['due_on'][:10] if milestone.get('due_on') else None,  # Just the date part
+    }
+
+
+def _label_content(label):
+    return {
+        'name': label['name'],
+        'color': label['color'].lstrip('#').lower(),  # GitLab doesn't want the #
+        'description': label.get('description') or '',
+    }
+
+
+def _comment_body(comment):
+    return f"**{comment['user']['login']}** (from GitHub):\n\n{comment['body']}"
 
 
 def main():
@@ -190,16 +499,23 @@ def main():
     
     syncer = ActivitySyncer()
     
-    if len(sys.argv) > 1:
-        activity_type = sys.argv[1]
+    # --full ignores the watermarks and re-reads everything
+    full = '--full' in sys.argv
+    args = [a for a in sys.argv[1:] if a not in ('--full', '--profile')]
+    
+    if args:
+        activity_type = args[0]
         if activity_type == 'milestones':
             syncer.sync_milestones()
         elif activity_type == 'labels':
             syncer.sync_labels()
-        elif activity_type == 'comments' and len(sys.argv) > 2:
-            syncer.sync_comments(int(sys.argv[2]))
+        elif activity_type == 'comments' and len(args) > 1:
+            syncer.sync_comments(int(args[1]), full)
+        elif activity_type == 'comments':
+            # No issue number - every issue's comments in one pass
+            syncer.sync_all_comments(full)
         else:
-            print("Usage: python sync_activities.py [milestones|labels|comments <issue_number>]")
+            print("Usage: python sync_activities.py [milestones|labels|comments [issue_number]] [--full] [--profile]")
     else:
         # Default: sync milestones and labels
         syncer.sync_milestones()
@@ -209,5 +525,5 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_with_metrics(main)
 
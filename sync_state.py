@@ -0,0 +1,201 @@
+# Local SQLite database that remembers what we've already synced
+# Maps GitHub ids/numbers <-> GitLab ids/iids so we don't have to go
+# searching the remote by title to figure out what matches what
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+SYNC_STATE_DB = os.getenv('SYNC_STATE_DB',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'git_gitlab_sync', 'state.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mappings (
+    pair TEXT NOT NULL,        -- 'github/repo|gitlab/repo'
+    kind TEXT NOT NULL,        -- issue, comment, label, milestone
+    source TEXT NOT NULL,      -- side it was copied from: github or gitlab
+    source_id TEXT NOT NULL,   -- number/iid for issues, id for comments/milestones, name for labels
+    target_id TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (pair, kind, source, source_id)
+);
+CREATE INDEX IF NOT EXISTS mappings_target ON mappings (pair, kind, source, target_id);
+
+CREATE TABLE IF NOT EXISTS watermarks (
+    pair TEXT NOT NULL,
+    name TEXT NOT NULL,        -- what it's for, e.g. 'issues:github-to-gitlab'
+    value TEXT NOT NULL,       -- newest updated_at we've fully synced (server time)
+    saved_at TEXT NOT NULL,
+    PRIMARY KEY (pair, name)
+);
+
+CREATE TABLE IF NOT EXISTS journal (
+    pair TEXT NOT NULL,
+    kind TEXT NOT NULL,        -- same keys as mappings
+    source TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    status TEXT NOT NULL,      -- planned (write about to go out), done, failed
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    PRIMARY KEY (pair, kind, source, source_id)
+);
+
+CREATE TABLE IF NOT EXISTS hashes (
+    pair TEXT NOT NULL,
+    kind TEXT NOT NULL,        -- same keys as mappings
+    source TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    hash TEXT NOT NULL,        -- content_hash() of what we last wrote to the other side
+    saved_at TEXT NOT NULL,
+    PRIMARY KEY (pair, kind, source, source_id)
+);
+"""
+
+
+def pair_key(github_repo, gitlab_repo):
+    return f"{github_repo}|{gitlab_repo}"
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.replace('\r\n', '\n').strip()
+    if isinstance(value, (list, tuple, set)):
+        return sorted(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def content_hash(content):
+    """Hash of the fields we copy for an object, to tell whether it changed since we last wrote it.
+    
+    Whitespace around strings and the order of lists (labels) don't count as changes.
+    """
+    text = json.dumps(_normalize(content), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class SyncState:
+    """Thin wrapper around the state database.
+    
+    Safe to share between threads. Every write is committed right away so
+    a crash never loses track of something we already created.
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or SYNC_STATE_DB
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        # WAL keeps the per-write commits cheap and lets batch workers read while one writes
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+    
+    def get(self, pair, kind, source, source_id):
+        """Target id for something we copied from <source>, or None"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT target_id FROM mappings WHERE pair=? AND kind=? AND source=? AND source_id=?',
+                (pair, kind, source, str(source_id))).fetchone()
+        return row[0] if row else None
+    
+    def reverse(self, pair, kind, source, target_id):
+        """Source id for something we created on the other side, or None"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT source_id FROM mappings WHERE pair=? AND kind=? AND source=? AND target_id=?',
+                (pair, kind, source, str(target_id))).fetchone()
+        return row[0] if row else None
+    
+    def load(self, pair, kind, source):
+        """All mappings of one kind as {source_id: target_id} - one query instead of one per item"""
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT source_id, target_id FROM mappings WHERE pair=? AND kind=? AND source=?',
+                (pair, kind, source)).fetchall()
+        return dict(rows)
+    
+    def put(self, pair, kind, source, source_id, target_id, digest=None):
+        """Remember a copy (and the content_hash of what it was created with, if given)"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO mappings (pair, kind, source, source_id, target_id, synced_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (pair, kind, source, str(source_id), str(target_id), now))
+            if digest:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO hashes (pair, kind, source, source_id, hash, saved_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (pair, kind, source, str(source_id), digest, now))
+            # Same transaction, so a journal entry is never left 'planned' for something we recorded
+            self.db.execute(
+                "UPDATE journal SET status='done', finished_at=? "
+                'WHERE pair=? AND kind=? AND source=? AND source_id=?',
+                (now, pair, kind, source, str(source_id)))
+    
+    # ---- Content hashes: so edits get copied over, but only when something changed ----
+    
+    def load_hashes(self, pair, kind, source):
+        """{source_id: hash} for everything of one kind we've copied"""
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT source_id, hash FROM hashes WHERE pair=? AND kind=? AND source=?',
+                (pair, kind, source)).fetchall()
+        return dict(rows)
+    
+    def set_hash(self, pair, kind, source, source_id, digest):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO hashes (pair, kind, source, source_id, hash, saved_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (pair, kind, source, str(source_id), digest, datetime.now(timezone.utc).isoformat()))
+    
+    # ---- Journal: written right before each create goes out ----
+    # If we get killed between the POST and put(), the entry stays 'planned' and
+    # the next run knows it has to check the other side before writing again.
+    
+    def begin(self, pair, kind, source, source_id):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO journal (pair, kind, source, source_id, status, started_at) '
+                "VALUES (?, ?, ?, ?, 'planned', ?)",
+                (pair, kind, source, str(source_id), datetime.now(timezone.utc).isoformat()))
+    
+    def fail(self, pair, kind, source, source_id):
+        """The write got a clear error back, so nothing was created"""
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE journal SET status='failed', finished_at=? "
+                'WHERE pair=? AND kind=? AND source=? AND source_id=?',
+                (datetime.now(timezone.utc).isoformat(), pair, kind, source, str(source_id)))
+    
+    def pending(self, pair, kind, source):
+        """Writes an earlier run started but never finished - they may or may not have landed"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT source_id FROM journal WHERE pair=? AND kind=? AND source=? AND status='planned'",
+                (pair, kind, source)).fetchall()
+        return {row[0] for row in rows}
+    
+    def get_watermark(self, pair, name):
+        """Where the last successful run got up to, or None if there wasn't one"""
+        with self.lock:
+            row = self.db.execute('SELECT value FROM watermarks WHERE pair=? AND name=?',
+                                  (pair, name)).fetchone()
+        return row[0] if row else None
+    
+    def set_watermark(self, pair, name, value):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO watermarks (pair, name, value, saved_at) VALUES (?, ?, ?, ?)',
+                (pair, name, value, datetime.now(timezone.utc).isoformat()))
+    
+    def close(self):
+        with self.lock:
+            self.db.close()